@@ -84,8 +84,10 @@ If you don't, then we have done a pretty bad job.
 # and then a very simple parser that scans a file top-to-bottom and builds the corresponding block.
 # At this point, however, we only care about the high-level architecture.
 
-# Starting at root folder, we will process all the `.py` files in sequence, producing for each one
+# Starting at root folder, we will process all the `.py` files, producing for each one
 # a markdown file that will be saved to the output folder.
+# Since every file is processed independently, the CLI spreads them over a pool of
+# worker processes, one per core unless told otherwise.
 
 # ### The outer loop
 
@@ -130,7 +132,7 @@ from .core import Parser
 
 def process(input_path: Path, output_path: Path, config: IlliterateConfig):
     # We need to create this folder hierarchy if it doesn't exists:
-    output_path.parent.mkdir(exist_ok=True)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # First we check if this is just a regular copy
     if input_path.suffix != ".py":
@@ -143,7 +145,8 @@ def process(input_path: Path, output_path: Path, config: IlliterateConfig):
             fp, config=config, module_name=input_path.name, location=input_path.parent
         ).parse()
 
-    # And then we dump the parsed content.
+    # And then we dump the parsed content. The whole document is rendered
+    # in memory first, so it reaches the file in a single write.
     with output_path.open("w") as fp:
         content.dump(fp)
 
@@ -12,12 +12,11 @@ with three commands, that manage the whole process.
 
 
 import typer
-import yaml
 
-# These two are for watching file changes.
+# This is for watching file changes. The observers themselves are only
+# imported by the `watch` command, since no other command needs them.
 
 from watchdog.events import FileModifiedEvent, FileSystemEventHandler
-from watchdog.observers import Observer
 
 # And these are internal.
 
@@ -32,13 +31,44 @@ app = typer.Typer()
 from pathlib import Path
 from typing import List
 
-from rich.progress import track
+# Files are processed in parallel, with a pool of worker processes,
+# sized after the number of available cores.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# ## Reading and writing YAML
+
+# YAML is only needed when a config file is read or printed, and `rich` only
+# when files are actually processed, so these are imported lazily.
+# This keeps `illiterate --help` and friends snappy.
+# We also prefer the much faster libyaml bindings, when PyYAML was built with them.
+
+
+def load_yaml(fp):
+    import yaml
+
+    return yaml.load(fp, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def dump_yaml(data) -> str:
+    import yaml
+
+    return yaml.dump(data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+
 
 # ## A command helper
 
 # Most of the commands will take either CLI args or a --config file.
 # So we will define a decorator now to take care of that bookkeeping and
 # obtain an instance of `IlliterateConfig`.
+# Commands can still declare their own options after the config argument,
+# and we will expose those to Typer as well, next to the common ones.
+# Typer discovers the options of a command by inspecting its signature,
+# so the decorator rewrites `__signature__` and `__annotations__` of the
+# wrapper to list both the common options and the command's own.
+
+import inspect
 
 
 def illiterate_command(fn):
@@ -50,26 +80,44 @@ def illiterate_command(fn):
         title: bool = False,
         expanded: bool = False,
         config: Path = None,
+        **options,
     ):
         if config:
             with config.open() as fp:
-                cfg = IlliterateConfig(**yaml.safe_load(fp))
+                cfg = IlliterateConfig.from_dict(load_yaml(fp))
         elif not src and Path("illiterate.yml").exists():
             with open("illiterate.yml") as fp:
-                cfg = IlliterateConfig(**yaml.safe_load(fp))
+                cfg = IlliterateConfig.from_dict(load_yaml(fp))
         else:
             if not src:
                 typer.echo("At least one source or a config file must be provided.")
                 raise typer.Exit(1)
 
             cfg = IlliterateConfig.make(
-                sources=src, inline=inline, linenums=linenums, highlights=highlights, title=title
+                sources=src,
+                inline=inline,
+                linenums=linenums,
+                highlights=highlights,
+                title=title,
             )
 
         if expanded:
             cfg = cfg.expanded()
 
-        return fn(cfg)
+        return fn(cfg, **options)
+
+    common = list(inspect.signature(command).parameters.values())[:-1]
+    specific = list(inspect.signature(fn).parameters.values())[1:]
+
+    command.__signature__ = inspect.Signature(common + specific)
+    command.__annotations__ = {
+        **command.__annotations__,
+        **{
+            p.name: fn.__annotations__[p.name]
+            for p in specific
+            if p.name in fn.__annotations__
+        },
+    }
 
     return command
 
@@ -79,12 +127,19 @@ def illiterate_command(fn):
 # Here is the implementation of the build command
 # is called when `python -m illiterate build` is used.
 # This command parse and creates the documentation based on its input parameters.
+# How many processes to use depends on the machine rather than on the project,
+# so `--jobs` is an option of the command, and not part of the config.
 
 
 @app.command("build")
 @illiterate_command
-def build(config: IlliterateConfig):
-    process_all(config)
+def build(
+    config: IlliterateConfig,
+    jobs: int = typer.Option(
+        0, min=0, help="Number of worker processes (0 means one per core)."
+    ),
+):
+    process_all(config, jobs)
 
 
 # ## The config command
@@ -93,7 +148,7 @@ def build(config: IlliterateConfig):
 @app.command("config")
 @illiterate_command
 def config(config: IlliterateConfig):
-    print(yaml.safe_dump(config.dict()))
+    print(dump_yaml(config.dict()))
 
 
 class IlliterateHandler(FileSystemEventHandler):
@@ -104,17 +159,51 @@ class IlliterateHandler(FileSystemEventHandler):
         self.cfg = cfg
         self.input_path = input_path
         self.output_path = output_path
+        self.last_seen = self.stamp()
+
+    # Editors often touch a file several times in a single save, so we
+    # only process it again if its modification time or size changed.
+
+    def stamp(self):
+        stat = self.input_path.stat()
+        return stat.st_mtime_ns, stat.st_size
 
     def on_modified(self, event: FileModifiedEvent):
+        stamp = self.stamp()
+
+        if stamp == self.last_seen:
+            return
+
+        self.last_seen = stamp
         typer.echo(f"Recreating: {self.input_path} -> {self.output_path}")
         process(self.input_path, self.output_path, self.cfg)
 
 
 @app.command("watch")
 @illiterate_command
-def watch(config: IlliterateConfig):
-    process_all(config)
-    observer = Observer()
+def watch(
+    config: IlliterateConfig,
+    jobs: int = typer.Option(
+        0, min=0, help="Number of worker processes (0 means one per core)."
+    ),
+    poll: float = typer.Option(
+        0.0,
+        min=0,
+        help="Poll for changes every POLL seconds (e.g., on network drives). "
+        "0 means native file system events.",
+    ),
+):
+    from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
+
+    process_all(config, jobs)
+
+    # Native file system events are not reliable on network mounts,
+    # so in that case the user can ask us to poll instead.
+    if poll:
+        observer = PollingObserver(timeout=poll)
+    else:
+        observer = Observer()
 
     for input_path, output_path in config.files():
         observer.schedule(
@@ -128,9 +217,48 @@ def watch(config: IlliterateConfig):
 # ## Processing a config file
 
 
-def process_all(cfg: IlliterateConfig):
+def process_all(cfg: IlliterateConfig, jobs: int = 0):
+    from rich.progress import track
+
     files = list(cfg.files())
 
     # This function does all the heavy-lifting...
-    for input_path, output_path in track(files):
-        process(input_path, output_path, cfg)
+    # Each file is parsed and written independently of the others, so we
+    # can spread them over `jobs` worker processes (or all the cores).
+    workers = min(jobs or os.cpu_count() or 1, len(files))
+
+    # Starting a pool is not free, so with a single worker we just
+    # process the files one after the other, right here.
+    if workers <= 1:
+        for input_path, output_path in track(files):
+            process(input_path, output_path, cfg)
+
+        return
+
+    # Otherwise, files are handed to the workers in chunks, big enough to
+    # save on communication, but small enough to keep every worker busy.
+    chunksize = max(1, len(files) // (4 * workers))
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(cfg,)
+    ) as executor:
+        results = executor.map(process_file, files, chunksize=chunksize)
+
+        for _ in track(results, total=len(files)):
+            pass
+
+
+# Each worker receives the config only once, when it starts,
+# instead of having it pickled again along with every file.
+
+_worker_config: IlliterateConfig = None
+
+
+def init_worker(cfg: IlliterateConfig):
+    global _worker_config
+    _worker_config = cfg
+
+
+def process_file(paths):
+    input_path, output_path = paths
+    process(input_path, output_path, _worker_config)
@@ -1,41 +1,70 @@
 from __future__ import annotations
 
+import dataclasses
+import fnmatch
+import os
 from pathlib import Path
 from typing import Dict, List
-from pydantic import BaseModel
 
 
-class IlliterateConfig(BaseModel):
+@dataclasses.dataclass
+class IlliterateConfig:
+    sources: Dict[str, str]
     inline: bool = False
     title: bool = False
     linenums: bool = False
     highlights: bool = False
-    sources: Dict[str, str]
+
+    _expanded = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> IlliterateConfig:
+        names = {field.name for field in dataclasses.fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def dict(self) -> dict:
+        return dataclasses.asdict(self)
 
     def expanded(self) -> IlliterateConfig:
+        if self._expanded is None:
+            self._expanded = self._expand()
+            self._expanded._expanded = self._expanded
+
+        return self._expanded
+
+    def _expand(self) -> IlliterateConfig:
         expanded_sources = {}
-        cwd = Path.cwd()
-        prefix_len = len(str(cwd))
+        cwd = os.getcwd()
+        prefix_len = len(cwd)
+        cwd_entries = None
 
         for input_pattern, output_pattern in self.sources.items():
-            if Path(input_pattern).is_dir():
-                input_paths = Path(input_pattern).resolve().rglob("*.py")
+            if os.path.isdir(input_pattern):
+                input_paths = _iter_py(os.path.realpath(input_pattern))
+            elif "**" in input_pattern:
+                input_paths = map(str, Path(cwd).rglob(input_pattern))
             else:
-                input_paths = Path.cwd().rglob(input_pattern)
+                if cwd_entries is None:
+                    cwd_entries = [entry.path for entry in _walk(cwd)]
+
+                input_paths = _glob(cwd_entries, input_pattern, prefix_len)
 
             for input_path in input_paths:
-                input_str = str(input_path)[prefix_len + 1 :]
-                output_str = output_pattern.replace("*", input_path.stem)
+                input_str = input_path[prefix_len + 1 :]
+                stem = os.path.splitext(os.path.basename(input_path))[0]
+                output_str = output_pattern.replace("*", stem)
 
-                if Path(output_str).is_dir():
-                    output_str = Path(output_str) / input_str
+                if os.path.isdir(output_str):
+                    if input_str.endswith(".py"):
+                        output_str = os.path.join(output_str, input_str[:-3] + ".md")
+                    else:
+                        output_str = os.path.join(output_str, input_str)
 
-                    if input_path.suffix == ".py":
-                        output_str = output_str.with_suffix(".md")
+                    output_str = os.path.normpath(output_str)
 
-                expanded_sources[input_str] = str(output_str)
+                expanded_sources[input_str] = output_str
 
-        return IlliterateConfig(inline=self.inline, sources=expanded_sources)
+        return dataclasses.replace(self, sources=expanded_sources)
 
     @classmethod
     def make(cls, *, sources: List[str], **kwargs):
@@ -50,3 +79,39 @@ class IlliterateConfig(BaseModel):
     def files(self):
         for input_path, output_path in self.expanded().sources.items():
             yield Path(input_path).resolve(), Path(output_path).resolve()
+
+
+def _walk(root: str):
+    # Like `Path.rglob`, unreadable directories are silently skipped.
+    stack = [root]
+
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+
+                    yield entry
+        except PermissionError:
+            continue
+
+
+def _iter_py(root: str):
+    for entry in _walk(root):
+        if entry.name.endswith(".py") and not entry.is_dir(follow_symlinks=False):
+            yield entry.path
+
+
+def _glob(paths: List[str], pattern: str, prefix_len: int):
+    # Same semantics as `Path.rglob(pattern)`, but matching against an
+    # already walked tree, so that many patterns need a single walk.
+    parts = Path(pattern).parts
+    depth = len(parts)
+    pattern = os.sep.join(parts)
+
+    for path in paths:
+        tail = path[prefix_len + 1 :].rsplit(os.sep, depth)
+
+        if len(tail) >= depth and fnmatch.fnmatch(os.sep.join(tail[-depth:]), pattern):
+            yield path
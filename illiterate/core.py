@@ -3,8 +3,9 @@ inside a Python file and perform the necessary conversions.
 """
 from __future__ import annotations
 
+import functools
+import io
 import logging
-import collections
 from pathlib import Path
 
 from illiterate.config import IlliterateConfig
@@ -47,22 +48,18 @@ from typing import Any, Iterable, TextIO, List
 class Block(abc.ABC):
     def __init__(self, name: str, content: List[str], module_name: str, lineno: int):
         self.module_name = module_name
-        self.lineno = lineno
         self.name = name
 
-        while content:
-            if not content[0].strip():  # testing for emptyness
-                content.pop(0)  # from the top down
-            else:
-                break
+        start, end = 0, len(content)
 
-        while content:
-            if not content[-1].strip():  # testing for emptyness
-                content.pop()  # from the bottom up
-            else:
-                break
+        while start < end and not content[start].strip():  # from the top down
+            start += 1
 
-        self.content = content
+        while end > start and not content[end - 1].strip():  # from the bottom up
+            end -= 1
+
+        self.content = content[start:end]
+        self.lineno = lineno + start
 
     def __str__(self):
         return "".join(self.content)
@@ -86,48 +83,78 @@ class Block(abc.ABC):
 # in our documentation, and have it translated automatically to
 # `../illiterate.core#ref:Markdown`.
 
+# Markdown lines can also contain directives, either `:hl:` to print a referenced
+# block of code, or `:include:` to copy the lines of another file.
+# Both are recognized by a single regular expression, so that each line is
+# scanned only once, and then we check which of the two alternatives matched.
+
 
 class Markdown(Block):
-    hl_re = re.compile(r":hl:(?P<ref>[a-zA-Z0-9_]+):")
-    include_re = re.compile(r":include:((?P<start>\-?\d+):)?((?P<end>\-?\d+):)?(?P<file>.*):")
+    directive_re = re.compile(
+        r":hl:(?P<ref>[a-zA-Z0-9_]+):"
+        r"|:include:((?P<start>\-?\d+):)?((?P<end>\-?\d+):)?(?P<file>.*):"
+    )
+
+    # All blocks collect their output in a list and write it at once.
+    # The only exception is a `:hl:` directive, since the referenced block prints
+    # itself, so we have to flush whatever we have collected before.
+    # The text of the block itself is collected apart, so that we can fix all its
+    # links at once (but not those of included files or highlighted code).
+
+    # Most blocks have no directives at all, which a single scan over the whole block
+    # can tell us, and then we don't need to look for them line by line.
 
     def print(self, fp: TextIO, content: Content):
+        parts = []
+        text = []
+        directives = self.directive_re.search(str(self)) is not None
+
         for line in self.content:
-            line = self.fix_links(line.strip())
+            line = line.strip()
 
             if line.startswith("# "):
-                if (match := self.hl_re.search(line)) :
-                    ref = match.group("ref")
-                    block = content[ref]
-                    block.print(fp, content)
-                    continue
+                if directives and (match := self.directive_re.search(line)):
+                    parts.append(self.fix_links("".join(text)))
+                    text.clear()
+
+                    if (ref := match.group("ref")):
+                        fp.write("".join(parts))
+                        parts.clear()
+
+                        block = content[ref]
+                        block.print(fp, content)
+                        continue
 
-                if (match := self.include_re.search(line)):
                     start = int(match.group('start') or 0) - 1
                     end = int(match.group('end') or -1)
                     file = match.group('file')
 
-                    with open(content.location / file) as include:
-                        lines = include.readlines()
-
-                        for line in lines[start:end]:
-                            fp.write(line)
+                    parts.extend(content.include(file)[start:end])
                     continue
 
-                fp.write(line[2:] + "\n")
+                text.append(line[2:] + "\n")
             else:
-                fp.write("\n")
+                text.append("\n")
 
-        fp.write("\n")
+        text.append("\n")
+        parts.append(self.fix_links("".join(text)))
+        fp.write("".join(parts))
 
     # Fixing the links is very easy if we use a regular expression.
     # Notice that we let the last part (the class or method name) as optional.
     # This means we can link to modules directly with `ref:module`.
 
+    # Since links never span more than one line, we can fix them in a whole
+    # chunk of text at once. And most chunks have no links at all, so we only
+    # bother with the regular expression when the text contains a `(ref:`.
+
     links_re = re.compile(r"\(ref:(?P<module>[a-zA-Z_\.]+)(:(?P<name>[a-zA-Z_\.]+))?\)")
 
-    def fix_links(self, line):
-        return self.links_re.sub(r"(../\g<module>/#ref:\g<name>)", line)
+    def fix_links(self, text):
+        if "(ref:" not in text:
+            return text
+
+        return self.links_re.sub(r"(../\g<module>/#ref:\g<name>)", text)
 
 
 # Python blocks are even easier, since we will print them as-is.
@@ -155,10 +182,15 @@ class Python(Block):
 
         if highlights:
             self.highlights = " ".join(str(i + 1) for i in highlights)
-        else:
-            self.highlights = " ".join(
-                [str(i + 1) for i, l in enumerate(self.content) if ":hl:" in l]
-            )
+
+    # Unless they are given explicitly, highlights are found by looking for `:hl:`
+    # markers in the code. Since they are only rendered when `--highlights` is
+    # passed in the CLI, we don't look for them until they are actually needed
+    # (see `markers` below).
+
+    @functools.cached_property
+    def highlights(self):
+        return self.markers[0]
 
     def print(self, fp: TextIO, content: Content):
         lines = []
@@ -174,22 +206,18 @@ class Python(Block):
         if not lines:
             return
 
-        fp.write("\n".join(self.get_anchors()) + "\n\n")
-
+        anchors = "\n".join(self.get_anchors())
         highlights = (
             f' hl_lines="{self.highlights}"'
-            if self.highlights and content.config.highlights
+            if content.config.highlights and self.highlights
             else ""
         )
         title = f' title="{self.module_name}"' if content.config.title else ""
         linenums = f' linenums="{self.lineno}"' if content.config.linenums else ""
 
-        fp.write(f"```python{linenums}{highlights}{title}\n")
-
-        for line in lines:
-            fp.write(self.strip(line) + "\n")
+        code = "".join([self.strip(line) + "\n" for line in lines])
 
-        fp.write("```\n\n")
+        fp.write(f"{anchors}\n\n```python{linenums}{highlights}{title}\n{code}```\n\n")
 
     # To get all valid anchors we'll make use of a simple regular expression.
 
@@ -199,43 +227,57 @@ class Python(Block):
     #     sort of stack to keep track of the outer definitions, because a class name can be defined
     #     in a different Python block than its inner methods.
 
-    anchor_re = re.compile(r"(?P<type>(class|def))\s(?P<name>[a-zA-Z0-9_]+)")
+    # The expression is matched at the start of every line of the whole block at once,
+    # so the regular expression engine does the looping instead of Python.
+    # Notice that the whitespace after `class` or `def` cannot be a line break.
+
+    anchor_re = re.compile(
+        r"^(?P<type>(class|def))[^\S\n](?P<name>[a-zA-Z0-9_]+)", re.MULTILINE
+    )
 
     def get_anchors(self):
         anchors = []
 
-        for line in self.content:
-            match: re.Match = self.anchor_re.match(line)
-
-            if match:
-                anchors.append(f"<a name=\"ref:{match.group('name')}\"></a>")
-                logger.debug("Found anchor: %r" % match)
+        for match in self.anchor_re.finditer(str(self)):
+            anchors.append(f"<a name=\"ref:{match.group('name')}\"></a>")
+            logger.debug("Found anchor: %r", match)
 
         return anchors
 
-    def strip(self, line: str):
-        result = []
-        comment = False
+    # Annotations such as `:hl:` or `:ref:` are removed from the printed code.
+    # That is, we cut each line at the first colon that comes after a `#`.
 
-        for c in line:
-            if c == "#":
-                comment = True
+    def strip(self, line: str):
+        comment = line.find("#")
 
-            if c == ":" and comment:
-                break
+        if comment >= 0 and (colon := line.find(":", comment)) >= 0:
+            line = line[:colon]
 
-            result.append(c)
+        return line.rstrip().rstrip("#")
 
-        return "".join(result).rstrip().rstrip("#")
+    # Both `:hl:` and `:ref:` markers are collected in a single pass over the code,
+    # the first time either of them is needed.
+    # Most lines have no marker at all, and a plain substring test
+    # is much cheaper than running the regular expression on them.
 
     ref_re = re.compile(r":ref:(?P<ref>[a-zA-Z0-9_]+):")
 
-    def extra(self):
-        refs = collections.defaultdict(list)
+    @functools.cached_property
+    def markers(self):
+        highlights = []
+        refs = {}
 
         for i, line in enumerate(self.content):
-            if (match := self.ref_re.search(line)) :
-                refs[match.group("ref")].append(i)
+            if ":hl:" in line:
+                highlights.append(str(i + 1))
+
+            if ":ref:" in line and (match := self.ref_re.search(line)):
+                refs.setdefault(match.group("ref"), []).append(i)
+
+        return " ".join(highlights), refs
+
+    def extra(self):
+        _, refs = self.markers
 
         return [
             Python(
@@ -255,11 +297,12 @@ class Python(Block):
 
 class Docstring(Block):
     def print(self, fp: TextIO, content: Content):
-        fp.write('??? note "Docstring"\n')
+        parts = ['??? note "Docstring"\n']
 
         for line in self.content:
-            line = line.strip().replace('"""', "")
-            fp.write(f"    {line}\n")
+            parts.append("    " + line.strip().replace('"""', "") + "\n")
+
+        fp.write("".join(parts))
 
 
 # Once we have our content types correctly implemented, we will
@@ -273,18 +316,51 @@ class Content:
         self.content = content
         self.config = config
         self.location = location
-        self._by_name = {block.name: block for block in content}
+        self._by_name = None
+        self._includes = {}
 
-        for block in content:
-            for extra in block.extra():
-                self._by_name[extra.name] = extra
+    # Blocks are only looked up by name from `:hl:` directives, which most modules
+    # don't have, so we don't build the index until the first lookup.
 
     def __getitem__(self, key) -> Block:
+        if self._by_name is None:
+            self._by_name = self._index()
+
         return self._by_name[key]
 
+    # Block names (`block-N`) and reference names can never clash, since
+    # references cannot contain a dash, so a single pass registers both.
+
+    def _index(self):
+        by_name = {}
+
+        for block in self.content:
+            by_name[block.name] = block
+
+            for extra in block.extra():
+                by_name[extra.name] = extra
+
+        return by_name
+
+    # Included files are read only once, no matter how many times
+    # they are referenced with `:include:` in the same module.
+
+    def include(self, file: str) -> List[str]:
+        if file not in self._includes:
+            with open(self.location / file) as fp:
+                self._includes[file] = fp.readlines()
+
+        return self._includes[file]
+
+    # Blocks are printed into memory first, and the whole file is written at once.
+
     def dump(self, fp: TextIO):
+        buffer = io.StringIO()
+
         for block in self.content:
-            block.print(fp, self)
+            block.print(buffer, self)
+
+        fp.write(buffer.getvalue())
 
 
 # ## The Parser
@@ -307,10 +383,13 @@ class Parser:
         self.config = config
         self.module_name = module_name
         self.content = []
-        self.state = State.Markdown
+        self.state = MARKDOWN
         self.lineno = 1
         self.location = location
 
+        if config.inline:
+            self.classify = self.classify_inline
+
     # The automaton switches states according to the first character of the current line.
     # Intuitively, as long as we are seeing either a `#` or blank lines, we are
     # seeing Markdown. Once we see a line that doesn't begin with a `#`, that
@@ -325,36 +404,34 @@ class Parser:
     # Doctrings always start with """. Once inside a docstring, until a line doesn't end
     # with """, we assume everything is part of the string.
 
-    def parse(self):
+    # All these rules only care about what kind of line we are looking at:
+    # a comment, the quotes of a docstring, or anything else (i.e., code).
+    # Hence, we classify each line only once, and then the next state is just
+    # a lookup in the transition table of the automaton, defined at the end.
+    # Every time the state changes, the lines seen so far make up a new block.
+
+    # Source files are small enough to read them in a single call, instead of
+    # going through the text decoder once per line.
+    # Since this loop runs once per line, we also keep everything it needs
+    # in local variables, which are much faster to access than attributes.
+    # Only when the state changes we sync it back to `self.state`, which
+    # is what `store` looks at.
+
+    def parse(self) -> Content:
         self.content = []
         current = []
 
-        for line in self.input_src:
-            if self.state == State.Docstring:
-                if line.strip().startswith('"""'):
-                    current = self.store(current)
-                    self.state = State.Markdown
-
-            elif self.state == State.Python:
-                if line.startswith("#") or (
-                    self.config.inline and line.strip().startswith("#")
-                ):
-                    current = self.store(current)
-                    self.state = State.Markdown
-                elif line.strip().startswith('"""'):
-                    current = self.store(current)
-                    self.state = State.Docstring
-
-            elif self.state == State.Markdown:
-                if line.strip().startswith('"""'):
-                    current = self.store(current)
-                    self.state = State.Docstring
-                elif not (
-                    line.startswith("#")
-                    or (self.config.inline and line.strip().startswith("#"))
-                ):
-                    current = self.store(current)
-                    self.state = State.Python
+        state = self.state
+        classify = self.classify
+        store = self.store
+        transitions = TRANSITIONS
+
+        for line in self.input_src.readlines():
+            next_state = transitions[state, classify(line)]
+
+            if next_state != state:
+                current = store(current)
+                state = self.state = next_state
 
             current.append(line)
 
@@ -362,37 +439,77 @@ class Parser:
 
         return Content(self.content, self.config, self.location)
 
+    # Classifying a line is a matter of looking at its first characters,
+    # stripping the leading whitespace only once.
+    # Since `inline` never changes while parsing, there is one classifier for
+    # each case, and `__init__` picks the right one, instead of checking
+    # the flag again on every line.
+
+    def classify(self, line: str) -> int:
+        if line.startswith("#"):
+            return COMMENT
+
+        if line.lstrip().startswith('"""'):
+            return QUOTES
+
+        return CODE
+
+    # With `inline`, both comments and quotes are checked after stripping,
+    # so a single `startswith` with both prefixes rules out plain code,
+    # which is by far the most common kind of line.
+
+    def classify_inline(self, line: str) -> int:
+        stripped = line.lstrip()
+
+        if not stripped.startswith(("#", '"""')):
+            return CODE
+
+        return COMMENT if stripped[0] == "#" else QUOTES
+
     # This small utility function creates the actual `Block` instance.
     # We make return an empty list so that we can use it as shown before,
     # by calling it and restoring `current = []` in the same line.
 
-    def store(self, current):
+    def store(self, current: List[str]) -> List[str]:
         if not current:
             return []
 
         name = f"block-{len(self.content)}"
+        block = BLOCKS[self.state](name, current, self.module_name, self.lineno)
 
-        if self.state == State.Markdown:
-            self.content.append(Markdown(name, current, self.module_name, self.lineno))
-        elif self.state == State.Python:
-            self.content.append(Python(name, current, self.module_name, self.lineno))
-        elif self.state == State.Docstring:
-            self.content.append(Docstring(name, current, self.module_name, self.lineno))
-
+        self.content.append(block)
         self.lineno += len(current)
 
         return []
 
 
-# Finally, here are the states.
+# Finally, here are the states, and the kinds of lines.
+# These are plain integers rather than enums, since they are compared (and hashed)
+# once per line, and integers are much cheaper for that.
+
+MARKDOWN, DOCSTRING, PYTHON = 1, 2, 3
+
+COMMENT, QUOTES, CODE = 1, 2, 3
+
+# Each state produces its own type of block.
+
+BLOCKS = {MARKDOWN: Markdown, DOCSTRING: Docstring, PYTHON: Python}
 
-import enum
 
+# And this is the transition table, with the next state for each
+# combination of current state and kind of line.
 
-class State(enum.Enum):
-    Markdown = 1
-    Docstring = 2
-    Python = 3
+TRANSITIONS = {
+    (MARKDOWN, COMMENT): MARKDOWN,
+    (MARKDOWN, QUOTES): DOCSTRING,
+    (MARKDOWN, CODE): PYTHON,
+    (PYTHON, COMMENT): MARKDOWN,
+    (PYTHON, QUOTES): DOCSTRING,
+    (PYTHON, CODE): PYTHON,
+    (DOCSTRING, COMMENT): DOCSTRING,
+    (DOCSTRING, QUOTES): MARKDOWN,
+    (DOCSTRING, CODE): DOCSTRING,
+}
 
 
 # And this is it 🖖.
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from illiterate.config import IlliterateConfig
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    for name in [
+        "main.py",
+        "Readme.md",
+        "pkg/__init__.py",
+        "pkg/core.py",
+        "pkg/notes.txt",
+        "pkg/sub/deep.py",
+    ]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("# Some content.\n")
+
+    (tmp_path / "docs").mkdir()
+
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def expand(sources):
+    return IlliterateConfig(sources=sources).expanded().sources
+
+
+def test_expand_directory(project):
+    assert expand({"pkg": "docs"}) == {
+        "pkg/__init__.py": "docs/pkg/__init__.md",
+        "pkg/core.py": "docs/pkg/core.md",
+        "pkg/sub/deep.py": "docs/pkg/sub/deep.md",
+    }
+
+
+def test_expand_glob(project):
+    assert expand({"*.py": "docs"}) == {
+        "main.py": "docs/main.md",
+        "pkg/__init__.py": "docs/pkg/__init__.md",
+        "pkg/core.py": "docs/pkg/core.md",
+        "pkg/sub/deep.py": "docs/pkg/sub/deep.md",
+    }
+
+
+def test_expand_glob_in_folder(project):
+    assert expand({"pkg/*.py": "docs"}) == {
+        "pkg/__init__.py": "docs/pkg/__init__.md",
+        "pkg/core.py": "docs/pkg/core.md",
+    }
+
+
+def test_expand_glob_with_output_pattern(project):
+    assert expand({"pkg/*.py": "api/*.md"}) == {
+        "pkg/__init__.py": "api/__init__.md",
+        "pkg/core.py": "api/core.md",
+    }
+
+
+def test_expand_literal_path(project):
+    assert expand({"Readme.md": "docs/index.md"}) == {"Readme.md": "docs/index.md"}
+
+
+def test_expand_recursive_glob(project):
+    assert expand({"**/deep.py": "docs"}) == {
+        "pkg/sub/deep.py": "docs/pkg/sub/deep.md",
+    }
+
+
+@pytest.fixture
+def locked_project(project):
+    locked = project / "locked"
+    locked.mkdir()
+    (locked / "b.py").write_text("# Unreachable.\n")
+    locked.chmod(0)
+
+    yield project
+
+    locked.chmod(0o755)
+
+
+@pytest.mark.parametrize("pattern", ["*.py", "."])
+def test_expand_skips_unreadable_directories(locked_project, pattern):
+    if os.access(locked_project / "locked", os.R_OK):
+        pytest.skip("directory permissions are not enforced for this user")
+
+    sources = expand({pattern: "docs"})
+
+    assert "pkg/core.py" in sources
+    assert not any(path.startswith("locked") for path in sources)
@@ -0,0 +1,35 @@
+import io
+import re
+
+from illiterate.config import IlliterateConfig
+from illiterate.core import Parser
+
+
+SOURCE = '''# Title
+
+
+import os
+
+
+# Middle
+
+
+
+def f():
+    """
+    Docs.
+    """
+
+    pass
+'''
+
+
+def test_linenums_skip_leading_blank_lines():
+    config = IlliterateConfig(sources={}, linenums=True)
+    content = Parser(io.StringIO(SOURCE), "module.py", config, None).parse()
+
+    output = io.StringIO()
+    content.dump(output)
+
+    # `import os`, `def f():` and `pass` are on lines 4, 11 and 16.
+    assert re.findall(r'linenums="(\d+)"', output.getvalue()) == ["4", "11", "16"]